@@ -3,6 +3,15 @@ import os
 from pathlib import Path
 
 class DatabaseManager:
+    # Files a user may see: public, owned, or shared with them. EXISTS matches each
+    # file once, where a join on file_permissions returned a row per permission.
+    _ACCESSIBLE = '''
+        f.is_public = 1 OR f.owner_id = ? OR EXISTS (
+            SELECT 1 FROM file_permissions fp
+            WHERE fp.file_id = f.id AND fp.user_id = ?
+        )
+    '''
+
     def __init__(self):
         self.db_path = Path("database/p2p_fileshare.db")
         self.conn = None
@@ -89,16 +98,34 @@ class DatabaseManager:
         )
         return self.cursor.fetchone()
 
-    def add_file(self, filename, file_path, file_size, owner_id, is_public, encryption_key):
-        """Add a new file to the database."""
+    def get_user_ids(self, usernames):
+        """Get user IDs for several usernames in one query; unknown names are skipped."""
+        if not usernames:
+            return []
+        placeholders = ', '.join('?' * len(usernames))
+        self.cursor.execute(
+            f"SELECT id FROM users WHERE username IN ({placeholders})",
+            tuple(usernames)
+        )
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def add_file(self, filename, file_path, file_size, owner_id, is_public, encryption_key,
+                 allowed_user_ids=()):
+        """Add a new file, and access for any allowed users, in a single transaction."""
         self.cursor.execute(
             """INSERT INTO files 
                (filename, file_path, file_size, owner_id, is_public, encryption_key)
                VALUES (?, ?, ?, ?, ?, ?)""",
             (filename, file_path, file_size, owner_id, is_public, encryption_key)
         )
+        file_id = self.cursor.lastrowid
+        if allowed_user_ids:
+            self.cursor.executemany(
+                "INSERT OR IGNORE INTO file_permissions (file_id, user_id) VALUES (?, ?)",
+                [(file_id, user_id) for user_id in allowed_user_ids]
+            )
         self.conn.commit()
-        return self.cursor.lastrowid
+        return file_id
 
     def add_file_permission(self, file_id, user_id):
         """Add permission for a user to access a private file."""
@@ -122,20 +149,20 @@ class DatabaseManager:
 
     def get_accessible_files(self, user_id):
         """Get all files accessible to a user (public files and private files with permission)."""
-        self.cursor.execute('''
+        self.cursor.execute(f'''
             SELECT f.* FROM files f
-            LEFT JOIN file_permissions fp ON f.id = fp.file_id
-            WHERE f.is_public = 1 OR f.owner_id = ? OR fp.user_id = ?
+            WHERE {self._ACCESSIBLE}
+            ORDER BY f.filename, f.id
         ''', (user_id, user_id))
         return self.cursor.fetchall()
 
     def search_files(self, user_id, search_term):
         """Search for files by name that are accessible to the user."""
-        self.cursor.execute('''
+        self.cursor.execute(f'''
             SELECT f.* FROM files f
-            LEFT JOIN file_permissions fp ON f.id = fp.file_id
-            WHERE (f.is_public = 1 OR f.owner_id = ? OR fp.user_id = ?)
+            WHERE ({self._ACCESSIBLE})
             AND f.filename LIKE ?
+            ORDER BY f.filename, f.id
         ''', (user_id, user_id, f'%{search_term}%'))
         return self.cursor.fetchall()
 
@@ -9,6 +9,8 @@ from database.db_manager import DatabaseManager
 from security.crypto import SecurityManager
 from network.p2p_manager import P2PManager
 
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
 class P2PFileShareApp:
     def __init__(self):
         self.app = ctk.CTk()
@@ -28,6 +30,9 @@ class P2PFileShareApp:
         self.current_user: Optional[Dict] = None
         self.selected_file: Optional[Dict] = None
         self.selected_users: List[str] = []
+        self.accessible_files: List[tuple] = []  # rows from the last refresh_file_list
+        self.shown_files: List[tuple] = []  # rows currently in the file list, in display order
+        self.downloading = False  # a download worker is running; only one at a time
         
         # Create main container
         self.main_container = ctk.CTkFrame(self.app)
@@ -207,13 +212,14 @@ class P2PFileShareApp:
         self.file_listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         self.file_listbox.bind('<<ListboxSelect>>', self.handle_file_select)
         
-        # Download button
-        download_button = ctk.CTkButton(
+        # Download button, kept disabled while a download is running
+        self.download_button = ctk.CTkButton(
             file_frame,
             text="Download Selected",
-            command=self.handle_download
+            command=self.handle_download,
+            state="disabled" if self.downloading else "normal"
         )
-        download_button.pack(fill=tk.X, padx=5, pady=5)
+        self.download_button.pack(fill=tk.X, padx=5, pady=5)
 
     def create_upload_section(self):
         """Create the file upload section."""
@@ -276,12 +282,12 @@ class P2PFileShareApp:
         self.user_listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # Upload button
-        upload_button = ctk.CTkButton(
+        self.upload_button = ctk.CTkButton(
             upload_frame,
             text="Upload",
             command=self.handle_upload
         )
-        upload_button.pack(fill=tk.X, padx=5, pady=5)
+        self.upload_button.pack(fill=tk.X, padx=5, pady=5)
 
     def handle_login(self):
         """Handle user login."""
@@ -343,12 +349,9 @@ class P2PFileShareApp:
             self.refresh_file_list()
             return
         
-        self.file_listbox.delete(0, tk.END)
-        files = self.db_manager.search_files(self.current_user['id'], search_term)
-        
-        for file in files:
-            file_id, filename, file_path, file_size, owner_id, is_public, _, uploaded_at = file
-            self.file_listbox.insert(tk.END, f"{filename} ({self.format_size(file_size)})")
+        # Filter the rows already loaded by the last refresh instead of querying again
+        term = search_term.lower()
+        self.show_files([file for file in self.accessible_files if term in file[1].lower()])
 
     def handle_file_select(self, event):
         """Handle file selection from the list."""
@@ -356,21 +359,19 @@ class P2PFileShareApp:
         if not selection:
             return
         
-        index = selection[0]
-        filename = self.file_listbox.get(index).split(" (")[0]
-        
-        # Get file details from database
-        files = self.db_manager.search_files(self.current_user['id'], filename)
-        if files:
-            self.selected_file = {
-                'id': files[0][0],
-                'filename': files[0][1],
-                'path': files[0][2],
-                'size': files[0][3]
-            }
+        # The row is already loaded; list positions match shown_files
+        file = self.shown_files[selection[0]]
+        self.selected_file = {
+            'id': file[0],
+            'filename': file[1],
+            'path': file[2],
+            'size': file[3]
+        }
 
     def handle_download(self):
         """Handle file download."""
+        if self.downloading:
+            return
         if not self.selected_file:
             messagebox.showerror("Error", "Please select a file to download")
             return
@@ -382,8 +383,28 @@ class P2PFileShareApp:
         # Record download in database
         self.db_manager.record_download(self.selected_file['id'], self.current_user['id'])
         
-        # Download file from peer
-        if self.p2p_manager.request_file("peer_id", str(self.selected_file['id']), str(download_path)):
+        # Download file from peer on a worker thread so the window keeps responding;
+        # a second download would append to the same file, so wait for this one
+        self.downloading = True
+        self.download_button.configure(state="disabled")
+        threading.Thread(
+            target=self._download_worker,
+            args=(str(self.selected_file['id']), download_path),
+            daemon=True
+        ).start()
+
+    def _download_worker(self, file_id, download_path):
+        """Fetch a file from a peer and report the result on the UI thread."""
+        success = self.p2p_manager.request_file("peer_id", file_id, str(download_path))
+        self.app.after(0, self._on_download_done, download_path, success)
+
+    def _on_download_done(self, download_path, success):
+        """Show the outcome of a finished download."""
+        self.downloading = False
+        # The button is gone if the user logged out while the download ran
+        if self.download_button.winfo_exists():
+            self.download_button.configure(state="normal")
+        if success:
             messagebox.showinfo("Success", f"File downloaded to {download_path}")
         else:
             messagebox.showerror("Error", "Failed to download file")
@@ -407,63 +428,104 @@ class P2PFileShareApp:
         is_public = self.privacy_var.get() == "public"
         selected_users = [self.user_listbox.get(i) for i in self.user_listbox.curselection()]
         
-        # Generate encryption key for the file
-        encryption_key = self.security_manager.generate_file_key()
-        
-        # Encrypt the file
-        encrypted_data = self.security_manager.encrypt_file(
-            self.selected_file['path'],
-            encryption_key
-        )
+        # Encrypt and write the file on a worker thread; the database and P2P
+        # updates happen back on the UI thread, which owns the sqlite connection
+        self.upload_button.configure(state="disabled")
+        threading.Thread(
+            target=self._encrypt_worker,
+            args=(self.current_user['id'], dict(self.selected_file), is_public, selected_users),
+            daemon=True
+        ).start()
+
+    def _encrypt_worker(self, owner_id, file_info, is_public, selected_users):
+        """Encrypt a file for upload and save it under uploads/."""
+        try:
+            # Generate encryption key for the file
+            encryption_key = self.security_manager.generate_file_key()
+            
+            # Encrypt the file
+            encrypted_data = self.security_manager.encrypt_file(file_info['path'], encryption_key)
+            
+            # Save encrypted file
+            upload_dir = Path("uploads")
+            encrypted_path = upload_dir / f"encrypted_{file_info['name']}"
+            with open(encrypted_path, 'wb') as f:
+                f.write(encrypted_data)
+            file_size = os.path.getsize(file_info['path'])
+        except Exception as e:
+            self.app.after(0, self._on_upload_failed, owner_id, str(e))
+            return
         
-        # Save encrypted file
-        upload_dir = Path("uploads")
-        encrypted_path = upload_dir / f"encrypted_{self.selected_file['name']}"
-        with open(encrypted_path, 'wb') as f:
-            f.write(encrypted_data)
+        self.app.after(0, self._finish_upload, owner_id, file_info, is_public, selected_users,
+                       encryption_key, encrypted_path, file_size)
+
+    def _upload_session_active(self, owner_id):
+        """Check that the user who started an upload is still logged in."""
+        return self.current_user is not None and self.current_user['id'] == owner_id
+
+    def _finish_upload(self, owner_id, file_info, is_public, selected_users, encryption_key,
+                       encrypted_path, file_size):
+        """Record an encrypted upload and share it."""
+        if not self._upload_session_active(owner_id):
+            # The user logged out while the file was encrypted; drop the orphaned copy
+            try:
+                os.remove(encrypted_path)
+            except OSError:
+                pass
+            return
+        self.upload_button.configure(state="normal")
         
-        # Add file to database
+        # Add file and permissions for selected users to database in one commit
+        allowed_user_ids = []
+        if not is_public and selected_users:
+            allowed_user_ids = self.db_manager.get_user_ids(selected_users)
         file_id = self.db_manager.add_file(
-            self.selected_file['name'],
+            file_info['name'],
             str(encrypted_path),
-            os.path.getsize(self.selected_file['path']),
-            self.current_user['id'],
+            file_size,
+            owner_id,
             is_public,
-            encryption_key.decode()
+            encryption_key.decode(),
+            allowed_user_ids
         )
         
-        # Add permissions for selected users
-        if not is_public and selected_users:
-            for username in selected_users:
-                user = self.db_manager.get_user(username)
-                if user:
-                    self.db_manager.add_file_permission(file_id, user[0])
-        
         # Share file through P2P network
         self.p2p_manager.share_file(str(file_id), str(encrypted_path))
         
         messagebox.showinfo("Success", "File uploaded successfully")
         self.refresh_file_list()
 
+    def _on_upload_failed(self, owner_id, error):
+        """Report a failed upload."""
+        if not self._upload_session_active(owner_id):
+            return
+        self.upload_button.configure(state="normal")
+        messagebox.showerror("Error", f"Failed to upload file: {error}")
+
     def refresh_file_list(self):
         """Refresh the file list with accessible files."""
         if not self.current_user:
             return
         
+        self.accessible_files = self.db_manager.get_accessible_files(self.current_user['id'])
+        self.show_files(self.accessible_files)
+
+    def show_files(self, files):
+        """Replace the file list contents with the given file rows."""
+        # Build every label first, then hand them to Tk in a single insert call
+        self.shown_files = list(files)
+        labels = [f"{file[1]} ({self.format_size(file[3])})" for file in self.shown_files]
         self.file_listbox.delete(0, tk.END)
-        files = self.db_manager.get_accessible_files(self.current_user['id'])
-        
-        for file in files:
-            file_id, filename, file_path, file_size, owner_id, is_public, _, uploaded_at = file
-            self.file_listbox.insert(tk.END, f"{filename} ({self.format_size(file_size)})")
+        if labels:
+            self.file_listbox.insert(tk.END, *labels)
 
     def format_size(self, size_bytes):
         """Format file size in human-readable format."""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size_bytes < 1024:
-                return f"{size_bytes:.1f} {unit}"
-            size_bytes /= 1024
-        return f"{size_bytes:.1f} TB"
+        if size_bytes < 1024:
+            return f"{size_bytes:.1f} B"
+        # Each unit is 2**10 of the previous, so the bit length picks it directly
+        idx = min((int(size_bytes).bit_length() - 1) // 10, 4)
+        return f"{size_bytes / (1 << (idx * 10)):.1f} {_SIZE_UNITS[idx]}"
 
     def run(self):
         """Run the application."""
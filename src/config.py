@@ -12,7 +12,7 @@ BUFFER_SIZE = 8192
 
 # File settings
 MAX_FILE_SIZE = 1024 * 1024 * 1024  # 1GB
-ALLOWED_EXTENSIONS = {
+ALLOWED_EXTENSIONS = frozenset({
     # Documents
     'txt', 'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx',
     # Images
@@ -27,7 +27,7 @@ ALLOWED_EXTENSIONS = {
     'py', 'java', 'cpp', 'c', 'h', 'js', 'html', 'css',
     # Other
     'json', 'xml', 'csv'
-}
+})
 
 # Database settings
 DB_DIR = Path.home() / '.p2p_fileshare'
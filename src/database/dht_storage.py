@@ -22,6 +22,8 @@ class DHTStorage:
         self._server_thread = None
         self._is_ready = False
         self._ready_event = threading.Event()
+        # Serializes check-then-store on user records within this node
+        self._user_lock = asyncio.Lock()
         
     def start(self):
         """Start the DHT server in a separate thread"""
@@ -74,6 +76,18 @@ class DHTStorage:
         except Exception as e:
             logger.error(f"Error stopping DHT server: {str(e)}")
 
+    def run_coroutine(self, coro, timeout: float = 5.0):
+        """Run a coroutine on the DHT's event loop from another thread and wait for its result"""
+        if not self._event_loop or not self._event_loop.is_running():
+            coro.close()
+            raise RuntimeError("DHT server is not running")
+        future = asyncio.run_coroutine_threadsafe(coro, self._event_loop)
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            future.cancel()
+            raise
+
     def _generate_key(self, data: str) -> str:
         """Generate a SHA-256 hash key for the data"""
         return hashlib.sha256(data.encode()).hexdigest()
@@ -124,6 +138,21 @@ class DHTStorage:
             logger.error(f"Failed to store user data: {str(e)}")
             return False
 
+    async def store_user_data_if_absent(self, username: str, user_data: Dict[str, Any]) -> bool:
+        """Store user data in DHT unless the user already exists
+        
+        Returns:
+            bool: True if the user was stored, False if it already existed or the store failed
+        """
+        if not self._is_ready:
+            raise RuntimeError("DHT server is not ready")
+        
+        async with self._user_lock:
+            if await self.get_user_data(username):
+                logger.warning(f"User {username} already exists")
+                return False
+            return await self.store_user_data(username, user_data)
+
     async def get_user_data(self, username: str) -> Optional[Dict[str, Any]]:
         """Retrieve user data from DHT"""
         if not self._is_ready:
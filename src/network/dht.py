@@ -6,9 +6,9 @@ This module implements a Kademlia-like DHT for peer discovery and file location.
 
 import logging
 import hashlib
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Set, Tuple
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +18,7 @@ class Node:
     id: str  # Node ID (hash of IP:port)
     address: Tuple[str, int]  # (IP, port)
     last_seen: datetime
-    files: List[str]  # List of file hashes this node has
+    files: Set[str]  # Hashes of the files this node has
 
 class DHT:
     """Distributed Hash Table implementation"""
@@ -34,7 +34,8 @@ class DHT:
         self.node_id = node_id
         self.address = address
         self.nodes: Dict[str, Node] = {}  # node_id -> Node
-        self.file_locations: Dict[str, List[str]] = {}  # file_hash -> [node_ids]
+        self.file_locations: Dict[str, Set[str]] = {}  # file_hash -> {node_ids}
+        self.node_timeout = timedelta(seconds=3600)
         logger.info(f"Initialized DHT node {node_id} at {address}")
     
     def add_node(self, node_id: str, address: Tuple[str, int]) -> bool:
@@ -57,7 +58,7 @@ class DHT:
             id=node_id,
             address=address,
             last_seen=datetime.now(),
-            files=[]
+            files=set()
         )
         logger.info(f"Added node {node_id} at {address}")
         return True
@@ -77,9 +78,10 @@ class DHT:
         
         # Remove node's files from file_locations
         for file_hash in self.nodes[node_id].files:
-            if file_hash in self.file_locations:
-                self.file_locations[file_hash].remove(node_id)
-                if not self.file_locations[file_hash]:
+            locations = self.file_locations.get(file_hash)
+            if locations is not None:
+                locations.discard(node_id)
+                if not locations:
                     del self.file_locations[file_hash]
         
         # Remove the node
@@ -101,15 +103,11 @@ class DHT:
         if node_id not in self.nodes:
             return False
         
-        # Add file to node's file list
-        if file_hash not in self.nodes[node_id].files:
-            self.nodes[node_id].files.append(file_hash)
+        # Add file to node's file set
+        self.nodes[node_id].files.add(file_hash)
         
-        # Add node to file's location list
-        if file_hash not in self.file_locations:
-            self.file_locations[file_hash] = []
-        if node_id not in self.file_locations[file_hash]:
-            self.file_locations[file_hash].append(node_id)
+        # Add node to file's location set
+        self.file_locations.setdefault(file_hash, set()).add(node_id)
         
         logger.info(f"Added file {file_hash} to node {node_id}")
         return True
@@ -128,15 +126,14 @@ class DHT:
         if node_id not in self.nodes:
             return False
         
-        # Remove file from node's file list
-        if file_hash in self.nodes[node_id].files:
-            self.nodes[node_id].files.remove(file_hash)
+        # Remove file from node's file set
+        self.nodes[node_id].files.discard(file_hash)
         
-        # Remove node from file's location list
-        if file_hash in self.file_locations:
-            if node_id in self.file_locations[file_hash]:
-                self.file_locations[file_hash].remove(node_id)
-            if not self.file_locations[file_hash]:
+        # Remove node from file's location set
+        locations = self.file_locations.get(file_hash)
+        if locations is not None:
+            locations.discard(node_id)
+            if not locations:
                 del self.file_locations[file_hash]
         
         logger.info(f"Removed file {file_hash} from node {node_id}")
@@ -152,12 +149,14 @@ class DHT:
         Returns:
             List[Tuple[str, int]]: List of (IP, port) tuples for nodes that have the file
         """
-        if file_hash not in self.file_locations:
+        locations = self.file_locations.get(file_hash)
+        if not locations:
             return []
         
-        return [self.nodes[node_id].address 
-                for node_id in self.file_locations[file_hash]
-                if node_id in self.nodes]
+        nodes = self.nodes
+        return [nodes[node_id].address 
+                for node_id in locations
+                if node_id in nodes]
     
     def get_peers(self) -> List[Tuple[str, int]]:
         """
@@ -168,17 +167,19 @@ class DHT:
         """
         return [node.address for node in self.nodes.values()]
     
-    def cleanup(self, max_age_seconds: int = 3600):
+    def cleanup(self, max_age_seconds: Optional[int] = None):
         """
         Remove nodes that haven't been seen in a while
         
         Args:
-            max_age_seconds: Maximum age in seconds before a node is considered dead
+            max_age_seconds: Maximum age in seconds before a node is considered
+                dead; defaults to node_timeout
         """
-        now = datetime.now()
+        max_age = self.node_timeout if max_age_seconds is None else timedelta(seconds=max_age_seconds)
+        cutoff = datetime.now() - max_age
         dead_nodes = [
             node_id for node_id, node in self.nodes.items()
-            if (now - node.last_seen).total_seconds() > max_age_seconds
+            if node.last_seen < cutoff
         ]
         
         for node_id in dead_nodes:
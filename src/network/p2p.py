@@ -5,7 +5,7 @@ import time
 from datetime import datetime
 import struct
 import os
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, Optional, Tuple
 
 class P2PNetwork:
     def __init__(self, port: int = 5000, multicast_group: str = '224.3.29.71'):
@@ -14,6 +14,8 @@ class P2PNetwork:
         self.socket = None
         self.running = False
         self.online_users: Dict[str, Tuple[str, int]] = {}  # username -> (ip, port)
+        self._online_list: List[str] = []  # usernames, rebuilt only when membership changes
+        self._users_changed_callbacks: List[Callable[[List[str]], None]] = []
         self.file_transfer_socket = None
         self.file_transfer_port = port + 1
         
@@ -50,6 +52,25 @@ class P2PNetwork:
         if self.file_transfer_socket:
             self.file_transfer_socket.close()
     
+    def on_users_changed(self, callback: Callable[[List[str]], None]):
+        """
+        Register a callback for users joining or leaving
+        
+        Args:
+            callback: Called with the current online users whenever the set changes.
+                Runs on the discovery thread, so UI code must marshal it to its own thread.
+        """
+        self._users_changed_callbacks.append(callback)
+    
+    def _set_online_list(self):
+        """Rebuild the online user list and notify listeners"""
+        self._online_list = list(self.online_users)
+        for callback in self._users_changed_callbacks:
+            try:
+                callback(self._online_list.copy())
+            except Exception as e:
+                print(f"Error in users changed callback: {e}")
+    
     def broadcast_presence(self, username: str):
         """Broadcast user presence to the network."""
         message = {
@@ -85,10 +106,16 @@ class P2PNetwork:
                 data, addr = self.socket.recvfrom(1024)
                 message = json.loads(data.decode())
                 
+                username = message['username']
                 if message['type'] == 'presence':
-                    self.online_users[message['username']] = (addr[0], self.port)
+                    # Presence is re-broadcast periodically; only new users change the list
+                    joined = username not in self.online_users
+                    self.online_users[username] = (addr[0], self.port)
+                    if joined:
+                        self._set_online_list()
                 elif message['type'] == 'absence':
-                    self.online_users.pop(message['username'], None)
+                    if self.online_users.pop(username, None) is not None:
+                        self._set_online_list()
             except Exception as e:
                 print(f"Error in user discovery: {e}")
     
@@ -167,4 +194,4 @@ class P2PNetwork:
     
     def get_online_users(self) -> List[str]:
         """Get a list of online users."""
-        return list(self.online_users.keys()) 
\ No newline at end of file
+        return self._online_list.copy() 
\ No newline at end of file
@@ -4,63 +4,175 @@ Peer Node Implementation
 This module implements the peer node functionality for the P2P network.
 """
 
+import asyncio
 import logging
 import socket
 import threading
 import hashlib
+import os
 import time
-import json
-from typing import Dict, List, Optional, Tuple, Callable
+from collections import deque
+from typing import Dict, List, Mapping, Optional, Set, Tuple, Callable
+from types import MappingProxyType
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from .protocol import Protocol, Message
+from .protocol import Protocol, Message, LENGTH_PREFIX
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+_unpack_len = LENGTH_PREFIX.unpack
+
+MAX_MESSAGE_SIZE = 1024 * 1024  # 1MB
+MAX_FILE_STREAM_SIZE = 1024 * 1024 * 1024  # 1GB
+FILE_STREAM_CHUNK_SIZE = 64 * 1024
+HANDSHAKE_TIMEOUT = 5.0  # seconds
+MAX_OUTBOX_FRAMES = 256  # queued frames per connection before senders wait on the socket
+
+@dataclass(slots=True)
 class PeerInfo:
     """Information about a peer node"""
     id: str
     address: Tuple[str, int]
-    last_seen: datetime
+    last_seen: float  # time.monotonic() reading
     status: str  # 'online', 'offline', 'connecting'
+    
+    @property
+    def last_seen_dt(self) -> datetime:
+        """last_seen as a wall-clock datetime, materialized on demand"""
+        return datetime.now() - timedelta(seconds=time.monotonic() - self.last_seen)
+
+class _Outbox:
+    """Outbound frame queue for one connection, drained in batches by a single writer task"""
+    
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.frames: deque = deque()
+        self.ready = asyncio.Event()
+        # Held while writing so a file body is never interleaved with queued frames
+        self.lock = asyncio.Lock()
+        # Set while a file body is being written; no other frames may be written then
+        self.sending_file = False
+        self.closed = False
+        self.task = asyncio.create_task(self._run())
+    
+    async def send(self, frame: bytes) -> bool:
+        """Queue a frame for the writer task; waits for the socket when the queue is full"""
+        if self.task.done():
+            return False
+        if len(self.frames) >= MAX_OUTBOX_FRAMES:
+            async with self.lock:
+                await self.flush()
+        self.frames.append(frame)
+        self.ready.set()
+        return True
+    
+    async def flush(self):
+        """Write every queued frame in one writelines call; the caller holds the lock"""
+        if self.frames:
+            frames = list(self.frames)
+            self.frames.clear()
+            self.writer.writelines(frames)
+        await self.writer.drain()
+    
+    async def _run(self):
+        try:
+            while True:
+                await self.ready.wait()
+                self.ready.clear()
+                async with self.lock:
+                    await self.flush()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error("Error sending message: %s", e)
+    
+    def close(self, final: Optional[bytes] = None):
+        """Stop the writer task and close the stream after any queued frames"""
+        self.task.cancel()
+        self.closed = True
+        if self.sending_file:
+            # A file body is half written, so nothing can follow it; the sender
+            # closes the stream once it stops writing
+            self.frames.clear()
+            return
+        if final is not None:
+            self.frames.append(final)
+        if self.frames:
+            self.writer.writelines(list(self.frames))
+            self.frames.clear()
+        self.writer.close()
+    
+    def abort(self):
+        """Stop the writer task and drop the stream without flushing"""
+        self.task.cancel()
+        self.frames.clear()
+        self.writer.transport.abort()
 
 class Peer:
     """Peer node implementation"""
     
-    def __init__(self, host: str, port: int):
+    def __init__(self, host: str, port: int, socket_buffer_size: Optional[int] = None):
         """
         Initialize the peer node
         
         Args:
             host: Host address to bind to
-            port: Port to bind to
+            port: Port to bind to; 0 lets the OS pick a free port when the peer starts
+            socket_buffer_size: Fixed kernel send/receive buffer size in bytes; None
+                leaves the kernel's TCP buffer autotuning on
         """
         self.host = host
         self.port = port
+        self.socket_buffer_size = socket_buffer_size
         self.id = self._generate_peer_id(host, port)
         self.protocol = Protocol(self.id)
-        self.peers: Dict[str, PeerInfo] = {}
+        # Writers mutate _peers_mut under _peers_lock and publish a read-only
+        # snapshot to self.peers, so readers can iterate without locking
+        self._peers_mut: Dict[str, PeerInfo] = {}
+        self._peers_lock = threading.Lock()
+        self.peers: Mapping[str, PeerInfo] = MappingProxyType({})
         self.connected = False
         self._socket = None
         self._listener_thread = None
         
-        # Register message handlers
-        self.protocol.register_handler(Protocol.MSG_HELLO, self._handle_hello)
-        self.protocol.register_handler(Protocol.MSG_PEER_LIST, self._handle_peer_list)
-        self.protocol.register_handler(Protocol.MSG_FILE_LIST, self._handle_file_list)
-        self.protocol.register_handler(Protocol.MSG_FILE_REQUEST, self._handle_file_request)
-        self.protocol.register_handler(Protocol.MSG_FILE_RESPONSE, self._handle_file_response)
-        self.protocol.register_handler(Protocol.MSG_PING, self._handle_ping)
-        self.protocol.register_handler(Protocol.MSG_PONG, self._handle_pong)
-        self.protocol.register_handler(Protocol.MSG_GOODBYE, self._handle_goodbye)
+        # Event loop state, owned by the listener thread
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._ready = threading.Event()
+        self._outboxes: Dict[asyncio.StreamWriter, _Outbox] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        # Established connections by peer ID, and the file IDs requested over each one
+        self._connections: Dict[str, asyncio.StreamWriter] = {}
+        self._requested_files: Dict[asyncio.StreamWriter, Set[str]] = {}
         
-        logger.info(f"Initialized peer {self.id} at {host}:{port}")
+        # Files this peer serves, file_id -> local path
+        self.shared_files: Dict[str, str] = {}
+        
+        # Dispatch table indexed by message type; shared with Protocol.register_handler
+        self._handlers = self.protocol.handlers
+        self._handlers[Protocol.MSG_HELLO] = self._handle_hello
+        self._handlers[Protocol.MSG_PEER_LIST] = self._handle_peer_list
+        self._handlers[Protocol.MSG_FILE_LIST] = self._handle_file_list
+        self._handlers[Protocol.MSG_FILE_RESPONSE] = self._handle_file_response
+        self._handlers[Protocol.MSG_PING] = self._handle_ping
+        self._handlers[Protocol.MSG_PONG] = self._handle_pong
+        self._handlers[Protocol.MSG_GOODBYE] = self._handle_goodbye
+        # Streamed file bodies are delivered like file responses
+        self._handlers[Protocol.MSG_FILE_STREAM] = self._handle_file_response
+        
+        logger.info("Initialized peer %s at %s:%s", self.id, host, port)
+    
+    def _add_peer(self, info: PeerInfo):
+        """Insert or replace a peer and publish a new snapshot of the peer table"""
+        with self._peers_lock:
+            self._peers_mut[info.id] = info
+            self.peers = MappingProxyType(dict(self._peers_mut))
     
     def _generate_peer_id(self, host: str, port: int) -> str:
         """Generate a unique peer ID"""
-        return hashlib.sha256(f"{host}:{port}".encode()).hexdigest()
+        return hashlib.blake2b(f"{host}:{port}".encode(), digest_size=32).hexdigest()
     
     def start(self):
         """Start the peer node"""
@@ -71,17 +183,30 @@ class Peer:
             # Create and bind socket
             self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            # Set before listen() so accepted sockets inherit the buffers and window scale
+            self._set_socket_buffers(self._socket)
             self._socket.bind((self.host, self.port))
-            self._socket.listen(5)
+            self._socket.setblocking(False)
+            if self.port == 0:
+                # The peer ID is derived from the address, so it follows the port the OS picked
+                self.port = self._socket.getsockname()[1]
+                self.id = self._generate_peer_id(self.host, self.port)
+                self.protocol.set_peer_id(self.id)
+            
+            self.connected = True
+            self._ready.clear()
+            self._stopping = asyncio.Event()
             
-            # Start listener thread
-            self._listener_thread = threading.Thread(target=self._listen, daemon=True)
+            # Run the event loop serving all connections in a dedicated thread
+            self._listener_thread = threading.Thread(target=self._run_loop, daemon=True)
             self._listener_thread.start()
             
-            self.connected = True
-            logger.info(f"Started peer {self.id} at {self.host}:{self.port}")
+            if not self._ready.wait(timeout=5) or self._server is None:
+                raise RuntimeError("Peer event loop failed to start")
+            
+            logger.info("Started peer %s at %s:%s", self.id, self.host, self.port)
         except Exception as e:
-            logger.error(f"Failed to start peer: {str(e)}")
+            logger.error("Failed to start peer: %s", e)
             self.stop()
             raise
     
@@ -89,6 +214,16 @@ class Peer:
         """Stop the peer node"""
         self.connected = False
         
+        if self._loop and self._stopping:
+            try:
+                self._loop.call_soon_threadsafe(self._stopping.set)
+            except RuntimeError:
+                pass  # Loop already closed
+        
+        if self._listener_thread:
+            self._listener_thread.join(timeout=1.0)
+            self._listener_thread = None
+        
         if self._socket:
             try:
                 self._socket.close()
@@ -96,206 +231,429 @@ class Peer:
                 pass
             self._socket = None
         
-        if self._listener_thread:
-            self._listener_thread.join(timeout=1.0)
-            self._listener_thread = None
+        logger.info("Stopped peer %s", self.id)
+    
+    def _run_loop(self):
+        """Run the peer's event loop until stop() is called"""
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            logger.error("Error in peer event loop: %s", e)
+        finally:
+            self._loop = None
+            self._server = None
+            self._ready.set()  # Unblock start() even if the loop failed
+    
+    async def _serve(self):
+        """Accept connections on the listening socket until stopped"""
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._handle_connection, sock=self._socket)
+        self._ready.set()
         
-        logger.info(f"Stopped peer {self.id}")
+        async with self._server:
+            await self._stopping.wait()
+            
+            # Say goodbye and close open connections, then let their handlers
+            # finish before the server shuts down
+            for outbox in list(self._outboxes.values()):
+                try:
+                    outbox.close(self.protocol.goodbye_frame)
+                except Exception as e:
+                    logger.error("Error closing connection: %s", e)
+            self._outboxes.clear()
+            if self._tasks:
+                await asyncio.wait(list(self._tasks), timeout=1.0)
     
-    def _listen(self):
-        """Listen for incoming connections"""
-        while self.connected:
-            try:
-                client_socket, address = self._socket.accept()
-                logger.info(f"New connection from {address}")
-                threading.Thread(
-                    target=self._handle_connection,
-                    args=(client_socket, address),
-                    daemon=True
-                ).start()
-            except Exception as e:
-                if self.connected:
-                    logger.error(f"Error accepting connection: {str(e)}")
-    
-    def _send_message(self, sock: socket.socket, message: Message) -> bool:
-        """Send a message through the socket"""
+    def _configure_socket(self, sock: socket.socket):
+        """Apply per-connection socket options"""
+        # Small control frames (hello/ping/pong) must not wait on Nagle
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._set_socket_buffers(sock)
+    
+    def _set_socket_buffers(self, sock: socket.socket):
+        """Apply the configured kernel buffer size, which also disables autotuning for the socket"""
+        size = self.socket_buffer_size
+        if size is None:
+            return
         try:
-            data = self.protocol.serialize_message(message)
-            logger.info(f"[SEND] Message type: {message.type}, Length: {len(data)} bytes, To: {sock.getpeername()}")
-            logger.debug(f"[SEND] Message content: {message.data}")
-            sock.sendall(data)
-            return True
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, size)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, size)
+        except OSError as e:
+            logger.warning("Could not set socket buffer sizes: %s", e)
+    
+    async def _send_message(self, writer: asyncio.StreamWriter, message: Message) -> bool:
+        """Send a message through the stream"""
+        # Length prefix and body go out as one buffer in a single write
+        data = self.protocol.serialize_message(message)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("[SEND] Message type: %s, Length: %s bytes, To: %s",
+                        message.type, len(data), writer.get_extra_info('peername'))
+        logger.debug("[SEND] Message content: %s", message.data)
+        return await self._send_frame(writer, data)
+    
+    async def _send_frame(self, writer: asyncio.StreamWriter, frame: bytes) -> bool:
+        """Queue an already serialized frame on the connection's outbox"""
+        try:
+            outbox = self._outboxes.get(writer)
+            if outbox is None:
+                writer.write(frame)
+                await writer.drain()
+                return True
+            return await outbox.send(frame)
         except Exception as e:
-            logger.error(f"Error sending message: {str(e)}")
+            logger.error("Error sending message: %s", e)
             return False
     
-    def _read_message(self, sock: socket.socket) -> Optional[Message]:
-        """Read a complete message from the socket"""
+    async def _read_message(self, reader: asyncio.StreamReader,
+                            writer: asyncio.StreamWriter) -> Optional[Message]:
+        """Read a complete message from the stream, aborting the connection on a malformed length"""
         try:
-            # Set a short timeout for reading
-            sock.settimeout(2.0)
-            
             # Read the message length (first 4 bytes)
-            logger.debug(f"[RECV] Waiting for message from {sock.getpeername()}")
-            length_data = sock.recv(4)
-            if len(length_data) != 4:
-                logger.error(f"Invalid length data received: {len(length_data)} bytes")
+            length, = _unpack_len(await reader.readexactly(LENGTH_PREFIX.size))
+            logger.debug("[RECV] Message length: %s bytes", length)
+            if not 0 < length <= MAX_MESSAGE_SIZE:
+                # Drop the connection before the body is buffered or read
+                logger.error("Invalid message length: %s", length)
+                self._abort_connection(writer)
                 return None
-                
-            message_length = int.from_bytes(length_data, 'big')
-            logger.debug(f"[RECV] Message length: {message_length} bytes")
-            if message_length <= 0 or message_length > 1024 * 1024:  # Max 1MB
-                logger.error(f"Invalid message length: {message_length}")
-                return None
-            
-            # Read the message data
-            message_data = b''
-            while len(message_data) < message_length:
-                chunk = sock.recv(min(4096, message_length - len(message_data)))
-                if not chunk:
-                    logger.error("Connection closed while reading message")
-                    return None
-                message_data += chunk
-                logger.debug(f"[RECV] Read {len(message_data)}/{message_length} bytes")
             
-            # Parse the message
-            logger.debug("[RECV] Parsing message")
-            message = self.protocol.deserialize_message(message_data)
-            logger.info(f"[RECV] Received message type: {message.type}, From: {sock.getpeername()}")
-            logger.debug(f"[RECV] Message content: {message.data}")
+            # Read and parse the message data
+            data = await reader.readexactly(length)
+            message = self.protocol.deserialize_message(data)
+            logger.info("[RECV] Received message type: %s", message.type)
+            logger.debug("[RECV] Message content: %s", message.data)
             return message
             
-        except socket.timeout:
-            logger.error("Timeout while reading message")
+        except asyncio.IncompleteReadError:
+            logger.info("Connection closed while reading message")
             return None
         except Exception as e:
-            logger.error(f"Error reading message: {str(e)}")
+            logger.error("Error reading message: %s", e)
             return None
-        finally:
-            sock.settimeout(None)
     
-    def _handle_connection(self, client_socket: socket.socket, address: Tuple[str, int]):
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
         """Handle an incoming connection"""
+        address = writer.get_extra_info('peername')
+        self._track_connection(writer, asyncio.current_task())
+        logger.info("[SERVER] New connection from %s", address)
+        
+        try:
+            peer_id = await asyncio.wait_for(self._accept_handshake(reader, writer, address), HANDSHAKE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.error("[SERVER] Timed out waiting for hello from %s", address)
+            peer_id = None
+        except Exception as e:
+            logger.error("[SERVER] Error in connection handler: %s", e)
+            peer_id = None
+        
+        if peer_id is None:
+            self._close_connection(writer)
+            return
+        
+        await self._process_messages(reader, writer, peer_id, address)
+    
+    async def _accept_handshake(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                address: Tuple[str, int]) -> Optional[str]:
+        """Wait for the connecting peer's hello and answer it; returns the peer ID on success"""
+        self._configure_socket(writer.get_extra_info('socket'))
+        
+        # Wait for the connecting peer's hello
+        logger.info("[SERVER] Waiting for hello from %s", address)
+        response = await self._read_message(reader, writer)
+        if not response:
+            logger.error("[SERVER] No hello received from %s", address)
+            return None
+        if response.type != Protocol.MSG_HELLO:
+            logger.error("[SERVER] Invalid response type %s from %s", response.type, address)
+            return None
+        
+        # Connection established
+        peer_id = response.sender_id
+        logger.info("[SERVER] Received hello from peer %s", peer_id)
+        self._add_peer(PeerInfo(
+            id=peer_id,
+            address=address,
+            last_seen=time.monotonic(),
+            status='online'
+        ))
+        self._connections[peer_id] = writer
+        
+        # Reply with the cached hello and our peer list in a single write
+        logger.info("[SERVER] Sending hello and peer list to %s", address)
+        peer_list_frame = self.protocol.serialize_message(self._create_peer_list_message())
+        writer.writelines([self.protocol.hello_frame, peer_list_frame])
+        await writer.drain()
+        
+        logger.info("[SERVER] Connection established with peer %s", peer_id)
+        return peer_id
+    
+    async def _process_messages(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                peer_id: str, address: Tuple[str, int]):
+        """Dispatch messages from an established connection until it closes"""
         try:
-            logger.info(f"[SERVER] New connection from {address}")
-            
-            # Send hello message
-            hello_msg = self.protocol.create_hello_message()
-            logger.info(f"[SERVER] Sending hello message to {address}")
-            if not self._send_message(client_socket, hello_msg):
-                logger.error(f"[SERVER] Failed to send hello message to {address}")
-                return
-            
-            # Wait for hello response
-            logger.info(f"[SERVER] Waiting for hello response from {address}")
-            response = self._read_message(client_socket)
-            if not response:
-                logger.error(f"[SERVER] No response received from {address}")
-                return
-            if response.type != Protocol.MSG_HELLO:
-                logger.error(f"[SERVER] Invalid response type {response.type} from {address}")
-                return
-            
-            # Connection established
-            peer_id = response.sender_id
-            logger.info(f"[SERVER] Received hello from peer {peer_id}")
-            self.peers[peer_id] = PeerInfo(
-                id=peer_id,
-                address=address,
-                last_seen=datetime.now(),
-                status='online'
-            )
-            logger.info(f"[SERVER] Connection established with peer {peer_id}")
-            
-            # Handle messages
             while self.connected:
-                message = self._read_message(client_socket)
+                message = await self._read_message(reader, writer)
                 if not message:
-                    logger.info(f"[SERVER] Connection closed by {address}")
+                    logger.info("[SERVER] Connection closed by %s", address)
                     break
                 
-                logger.info(f"[SERVER] Received message type {message.type} from {address}")
-                response = self.protocol.handle_message(message)
+                logger.info("[SERVER] Received message type %s from %s", message.type, address)
+                
+                # File bodies bypass the message codec in both directions
+                if message.type == Protocol.MSG_FILE_REQUEST:
+                    # Send from its own task so this loop keeps reading while the body goes out
+                    self._start_task(self._send_file(writer, message.data.get('file_id')))
+                    continue
+                if message.type == Protocol.MSG_FILE_STREAM:
+                    message = await self._read_file_stream(reader, writer, message)
+                    if not message:
+                        break
+                
+                handler = self._handlers[message.type]
+                response = handler(message) if handler else None
                 if response:
-                    logger.info(f"[SERVER] Sending response type {response.type} to {address}")
-                    self._send_message(client_socket, response)
+                    logger.info("[SERVER] Sending response type %s to %s", response.type, address)
+                    await self._send_message(writer, response)
                     
         except Exception as e:
-            logger.error(f"[SERVER] Error in connection handler: {str(e)}")
+            logger.error("[SERVER] Error in connection handler: %s", e)
         finally:
-            client_socket.close()
-            if peer_id in self.peers:
-                self.peers[peer_id].status = 'offline'
-            logger.info(f"[SERVER] Connection closed with {address}")
+            self._close_connection(writer)
+            if self._connections.get(peer_id) is writer:
+                del self._connections[peer_id]
+            info = self.peers.get(peer_id)
+            if info is not None:
+                info.status = 'offline'
+            logger.info("[SERVER] Connection closed with %s", address)
+    
+    async def _send_file(self, writer: asyncio.StreamWriter, file_id: str) -> bool:
+        """Stream a shared file as a MSG_FILE_STREAM header followed by the raw body
+        
+        Files that can't be sent are answered with an error header so the requester
+        isn't left waiting.
+        """
+        outbox = self._outboxes.get(writer)
+        if outbox is None:
+            return False
+        
+        path = self.shared_files.get(file_id)
+        if path is None:
+            logger.warning("Requested file %s is not shared", file_id)
+            return await self._send_file_error(writer, file_id, "not_found")
+        try:
+            f = open(path, 'rb')
+        except OSError as e:
+            logger.error("Cannot open shared file %s: %s", file_id, e)
+            return await self._send_file_error(writer, file_id, "unavailable")
+        
+        try:
+            with f:
+                size = os.fstat(f.fileno()).st_size
+                if size > MAX_FILE_STREAM_SIZE:
+                    # The receiver would drop the connection on this announcement
+                    logger.warning("Shared file %s is too large to stream (%s bytes)", file_id, size)
+                    return await self._send_file_error(writer, file_id, "too_large")
+                header = self.protocol.create_file_stream_message(file_id, size)
+                async with outbox.lock:
+                    # Flush queued frames and the header before the body goes out
+                    outbox.frames.append(self.protocol.serialize_message(header))
+                    await outbox.flush()
+                    
+                    # Written in chunks rather than with loop.sendfile: asyncio's native
+                    # sendfile pauses reading on the transport until the whole body is out,
+                    # which stalls two peers sending files to each other on one connection
+                    outbox.sending_file = True
+                    try:
+                        remaining = size
+                        while remaining and not outbox.closed:
+                            chunk = await self._loop.run_in_executor(
+                                None, f.read, min(FILE_STREAM_CHUNK_SIZE, remaining))
+                            if not chunk:
+                                # The file shrank; the receiver would wait for bytes that never come
+                                logger.error("Shared file %s changed while streaming", file_id)
+                                self._abort_connection(writer)
+                                return False
+                            writer.write(chunk)
+                            remaining -= len(chunk)
+                            await writer.drain()
+                    finally:
+                        outbox.sending_file = False
+                        if outbox.closed:
+                            writer.close()
+            logger.info("[SEND] Streamed file %s (%s bytes)", file_id, size)
+            return True
+        except Exception as e:
+            logger.error("Error streaming file %s: %s", file_id, e)
+            return False
+    
+    async def _send_file_error(self, writer: asyncio.StreamWriter, file_id: str, error: str) -> bool:
+        """Tell the requester a file won't be sent"""
+        await self._send_message(writer, self.protocol.create_file_stream_error_message(file_id, error))
+        return False
+    
+    async def _read_file_stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                                header: Message) -> Optional[Message]:
+        """Read the raw body announced by a MSG_FILE_STREAM header and attach it as data['data']
+        
+        Only streams this peer requested over the same connection are accepted; anything
+        else aborts the connection before the body is read.
+        """
+        file_id = header.data.get('file_id')
+        size = header.data.get('size')
+        if type(size) is not int or not 0 <= size <= MAX_FILE_STREAM_SIZE:
+            logger.error("Invalid file stream size: %s", size)
+            self._abort_connection(writer)
+            return None
+        requested = self._requested_files.get(writer)
+        if type(file_id) is not str or not requested or file_id not in requested:
+            logger.error("Received unrequested file stream %s", file_id)
+            self._abort_connection(writer)
+            return None
+        requested.discard(file_id)
+        
+        error = header.data.get('error')
+        if error is not None:
+            if size:
+                logger.error("File stream error header for %s announced a body", file_id)
+                self._abort_connection(writer)
+                return None
+            logger.warning("Peer could not send file %s: %s", file_id, error)
+            return header
+        
+        # Grow the buffer as bytes arrive rather than allocating the announced size up front
+        body = bytearray()
+        while len(body) < size:
+            chunk = await reader.read(min(FILE_STREAM_CHUNK_SIZE, size - len(body)))
+            if not chunk:
+                logger.info("Connection closed while reading file stream")
+                return None
+            body += chunk
+        
+        header.data['data'] = body
+        return header
+    
+    def _open_outbox(self, writer: asyncio.StreamWriter):
+        """Start batching outbound frames for a connection"""
+        if writer not in self._outboxes:
+            self._outboxes[writer] = _Outbox(writer)
+    
+    def _track_connection(self, writer: asyncio.StreamWriter, task: asyncio.Task):
+        """Track a connection and the task serving it so stop() can close them"""
+        self._open_outbox(writer)
+        self._track_task(task)
+    
+    def _track_task(self, task: asyncio.Task):
+        """Keep a task in _tasks until it finishes so stop() and reset() wait for it"""
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    def _start_task(self, coro) -> asyncio.Task:
+        """Run a coroutine as a tracked task on the peer's loop"""
+        task = asyncio.create_task(coro)
+        self._track_task(task)
+        return task
+    
+    def _close_connection(self, writer: asyncio.StreamWriter):
+        """Close a connection after its queued frames and stop tracking it"""
+        self._requested_files.pop(writer, None)
+        outbox = self._outboxes.pop(writer, None)
+        if outbox is None:
+            writer.close()
+        else:
+            outbox.close()
+    
+    def _abort_connection(self, writer: asyncio.StreamWriter):
+        """Drop a misbehaving connection immediately, discarding any buffered data"""
+        self._requested_files.pop(writer, None)
+        outbox = self._outboxes.pop(writer, None)
+        if outbox is None:
+            writer.transport.abort()
+        else:
+            outbox.abort()
     
     def connect(self, host: str, port: int) -> bool:
         """Connect to another peer"""
-        if not self.connected:
+        if not self.connected or not self._loop:
             logger.error("[CLIENT] Cannot connect: peer is not started")
             return False
         
-        logger.info(f"[CLIENT] Connecting to {host}:{port}")
+        future = asyncio.run_coroutine_threadsafe(self._connect(host, port), self._loop)
+        try:
+            return future.result(timeout=2 * HANDSHAKE_TIMEOUT)
+        except Exception as e:
+            future.cancel()
+            logger.error("[CLIENT] Connection failed: %s", e)
+            return False
+    
+    async def _connect(self, host: str, port: int) -> bool:
+        """Open a connection to another peer and perform the hello handshake"""
+        logger.info("[CLIENT] Connecting to %s:%s", host, port)
         
         try:
             # Create connection
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5.0)
-            logger.info(f"[CLIENT] Attempting to connect socket to {host}:{port}")
-            sock.connect((host, port))
+            logger.info("[CLIENT] Attempting to connect socket to %s:%s", host, port)
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), HANDSHAKE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.error("[CLIENT] Connection timeout")
+            return False
+        except ConnectionRefusedError:
+            logger.error("[CLIENT] Connection refused")
+            return False
+        except Exception as e:
+            logger.error("[CLIENT] Connection failed: %s", e)
+            return False
+        
+        self._open_outbox(writer)
+        try:
             logger.info("[CLIENT] Socket connected successfully")
+            self._configure_socket(writer.get_extra_info('socket'))
             
-            # Send hello message
-            hello_msg = self.protocol.create_hello_message()
+            # Send the cached hello frame
             logger.info("[CLIENT] Sending hello message")
-            if not self._send_message(sock, hello_msg):
+            if not await self._send_frame(writer, self.protocol.hello_frame):
                 logger.error("[CLIENT] Failed to send hello message")
+                self._close_connection(writer)
                 return False
             
             # Wait for hello response
             logger.info("[CLIENT] Waiting for hello response")
-            response = self._read_message(sock)
+            response = await asyncio.wait_for(self._read_message(reader, writer), HANDSHAKE_TIMEOUT)
             if not response:
                 logger.error("[CLIENT] No response received")
+                self._close_connection(writer)
                 return False
             if response.type != Protocol.MSG_HELLO:
-                logger.error(f"[CLIENT] Invalid response type: {response.type}")
+                logger.error("[CLIENT] Invalid response type: %s", response.type)
+                self._close_connection(writer)
                 return False
-            
-            # Connection established
-            peer_id = response.sender_id
-            logger.info(f"[CLIENT] Received hello from peer {peer_id}")
-            self.peers[peer_id] = PeerInfo(
-                id=peer_id,
-                address=(host, port),
-                last_seen=datetime.now(),
-                status='online'
-            )
-            
-            # Start connection handler
-            threading.Thread(
-                target=self._handle_connection,
-                args=(sock, (host, port)),
-                daemon=True
-            ).start()
-            
-            logger.info(f"[CLIENT] Connected to peer {peer_id}")
-            return True
-            
-        except socket.timeout:
-            logger.error("[CLIENT] Connection timeout")
-            return False
-        except ConnectionRefusedError:
-            logger.error("[CLIENT] Connection refused")
+        except asyncio.TimeoutError:
+            logger.error("[CLIENT] Timed out waiting for hello response")
+            self._close_connection(writer)
             return False
         except Exception as e:
-            logger.error(f"[CLIENT] Connection failed: {str(e)}")
+            logger.error("[CLIENT] Connection failed: %s", e)
+            self._close_connection(writer)
             return False
-        finally:
-            if not self.connected:
-                try:
-                    sock.close()
-                except:
-                    pass
+        
+        # Connection established
+        peer_id = response.sender_id
+        logger.info("[CLIENT] Received hello from peer %s", peer_id)
+        self._add_peer(PeerInfo(
+            id=peer_id,
+            address=(host, port),
+            last_seen=time.monotonic(),
+            status='online'
+        ))
+        self._connections[peer_id] = writer
+        
+        # Serve the connection on the event loop
+        task = asyncio.create_task(self._process_messages(reader, writer, peer_id, (host, port)))
+        self._track_connection(writer, task)
+        
+        logger.info("[CLIENT] Connected to peer %s", peer_id)
+        return True
     
     def disconnect(self, peer_id: str) -> bool:
         """
@@ -312,9 +670,69 @@ class Peer:
         
         # Update peer status
         self.peers[peer_id].status = 'offline'
-        logger.info(f"Disconnected from peer {peer_id}")
+        logger.info("Disconnected from peer %s", peer_id)
         return True
     
+    def reset(self):
+        """Close every open connection and forget all known peers"""
+        if self._loop:
+            future = asyncio.run_coroutine_threadsafe(self._drop_connections(), self._loop)
+            future.result(timeout=2 * HANDSHAKE_TIMEOUT)
+        with self._peers_lock:
+            self._peers_mut.clear()
+            self.peers = MappingProxyType({})
+    
+    async def _drop_connections(self):
+        """Close open connections and wait briefly for their handlers to finish"""
+        for writer in list(self._outboxes):
+            self._close_connection(writer)
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=1.0)
+    
+    def share_file(self, file_id: str, path: str):
+        """
+        Make a local file available to peers
+        
+        Args:
+            file_id: ID peers use to request the file
+            path: Local path of the file
+        """
+        self.shared_files[file_id] = path
+    
+    def request_file(self, peer_id: str, file_id: str) -> bool:
+        """
+        Ask a connected peer to stream one of its shared files
+        
+        The body arrives as a MSG_FILE_STREAM message with the bytes in data['data'],
+        or with data['error'] set if the peer can't send the file.
+        
+        Args:
+            peer_id: ID of the peer serving the file
+            file_id: ID the peer shares the file under
+            
+        Returns:
+            bool: True if the request was sent
+        """
+        if not self.connected or not self._loop:
+            return False
+        
+        future = asyncio.run_coroutine_threadsafe(self._request_file(peer_id, file_id), self._loop)
+        try:
+            return future.result(timeout=HANDSHAKE_TIMEOUT)
+        except Exception as e:
+            future.cancel()
+            logger.error("Error requesting file %s: %s", file_id, e)
+            return False
+    
+    async def _request_file(self, peer_id: str, file_id: str) -> bool:
+        """Record the request so the answering stream is accepted, then send it"""
+        writer = self._connections.get(peer_id)
+        if writer is None:
+            logger.warning("No connection to peer %s", peer_id)
+            return False
+        self._requested_files.setdefault(writer, set()).add(file_id)
+        return await self._send_message(writer, self.protocol.create_file_request_message(file_id))
+    
     def send_message(self, peer_id: str, message: Message) -> bool:
         """
         Send a message to a peer
@@ -362,14 +780,18 @@ class Peer:
         # Update peer info
         peer_id = message.sender_id
         if peer_id not in self.peers:
-            self.peers[peer_id] = PeerInfo(
+            self._add_peer(PeerInfo(
                 id=peer_id,
                 address=message.data.get('address', ('unknown', 0)),
-                last_seen=datetime.now(),
+                last_seen=time.monotonic(),
                 status='online'
-            )
+            ))
         
         # Send peer list in response
+        return self._create_peer_list_message()
+    
+    def _create_peer_list_message(self) -> Message:
+        """Create a peer list message from the currently connected peers"""
         return self.protocol.create_peer_list_message([
             {"id": p.id, "address": p.address}
             for p in self.get_connected_peers()
@@ -378,15 +800,25 @@ class Peer:
     def _handle_peer_list(self, message: Message) -> Optional[Message]:
         """Handle peer list message"""
         # Update peer list
-        for peer in message.data.get('peers', []):
-            peer_id = peer['id']
-            if peer_id != self.id and peer_id not in self.peers:
-                self.peers[peer_id] = PeerInfo(
-                    id=peer_id,
-                    address=tuple(peer['address']),
-                    last_seen=datetime.now(),
-                    status='online'
-                )
+        incoming = {peer['id']: peer['address'] for peer in message.data.get('peers', [])}
+        incoming.pop(self.id, None)
+        now = time.monotonic()
+        with self._peers_lock:
+            known = self._peers_mut
+            
+            # Refresh known peers in place instead of allocating new PeerInfo objects
+            for peer_id in incoming.keys() & known.keys():
+                info = known[peer_id]
+                info.last_seen = now
+                info.status = 'online'
+            
+            new_ids = incoming.keys() - known.keys()
+            for peer_id in new_ids:
+                known[peer_id] = PeerInfo(peer_id, tuple(incoming[peer_id]), now, 'online')
+            
+            # Publish one snapshot for the whole batch
+            if new_ids:
+                self.peers = MappingProxyType(dict(known))
         return None
     
     def _handle_file_list(self, message: Message) -> Optional[Message]:
@@ -394,11 +826,6 @@ class Peer:
         # TODO: Implement file list handling
         return None
     
-    def _handle_file_request(self, message: Message) -> Optional[Message]:
-        """Handle file request message"""
-        # TODO: Implement file request handling
-        return None
-    
     def _handle_file_response(self, message: Message) -> Optional[Message]:
         """Handle file response message"""
         # TODO: Implement file response handling
@@ -4,46 +4,67 @@ P2P Protocol Implementation
 This module implements the basic protocol for peer-to-peer communication.
 """
 
-import json
 import logging
+import struct
+import time
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable, List
+
+import msgpack
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Frame length prefix: 4-byte big-endian unsigned int
+LENGTH_PREFIX = struct.Struct('>I')
+_pack_len = LENGTH_PREFIX.pack
+
+@dataclass(slots=True)
 class Message:
     """P2P message structure"""
-    type: str
+    type: int
     data: Dict[str, Any]
-    timestamp: datetime
+    timestamp: float  # Seconds since the epoch (time.time())
     sender_id: str
 
 class Protocol:
     """P2P protocol implementation"""
     
-    # Message types
-    MSG_HELLO = "hello"
-    MSG_PEER_LIST = "peer_list"
-    MSG_FILE_LIST = "file_list"
-    MSG_FILE_REQUEST = "file_request"
-    MSG_FILE_RESPONSE = "file_response"
-    MSG_PING = "ping"
-    MSG_PONG = "pong"
-    MSG_GOODBYE = "goodbye"
+    # Message types (dense opcodes, used as indices into the handler table)
+    MSG_HELLO = 0
+    MSG_PEER_LIST = 1
+    MSG_FILE_LIST = 2
+    MSG_FILE_REQUEST = 3
+    MSG_FILE_RESPONSE = 4
+    MSG_PING = 5
+    MSG_PONG = 6
+    MSG_GOODBYE = 7
+    MSG_FILE_STREAM = 8  # Header frame; the raw file body follows it on the stream
+    MSG_MAX = MSG_FILE_STREAM
     
     def __init__(self, peer_id: str):
         """
         Initialize the protocol
         
+        Args:
+            peer_id: ID of the peer using this protocol
+        """
+        self.handlers: List[Optional[Callable[[Message], Optional[Message]]]] = [None] * (self.MSG_MAX + 1)
+        self.set_peer_id(peer_id)
+    
+    def set_peer_id(self, peer_id: str):
+        """
+        Set the sender ID and rebuild the cached frames that carry it
+        
         Args:
             peer_id: ID of the peer using this protocol
         """
         self.peer_id = peer_id
-        self.message_handlers: Dict[str, callable] = {}
+        
+        # Static messages are serialized once; their timestamp is the time they were built
+        self.hello_frame = self.serialize_message(self.create_hello_message())
+        self.goodbye_frame = self.serialize_message(self.create_goodbye_message())
     
-    def create_message(self, msg_type: str, data: Dict[str, Any]) -> Message:
+    def create_message(self, msg_type: int, data: Dict[str, Any]) -> Message:
         """
         Create a new message
         
@@ -57,7 +78,7 @@ class Protocol:
         return Message(
             type=msg_type,
             data=data,
-            timestamp=datetime.now(),
+            timestamp=time.time(),
             sender_id=self.peer_id
         )
     
@@ -71,15 +92,13 @@ class Protocol:
         Returns:
             bytes: Serialized message with length prefix
         """
-        data = {
+        message_bytes = msgpack.packb({
             "type": message.type,
             "data": message.data,
-            "timestamp": message.timestamp.isoformat(),
-            "sender_id": message.sender_id
-        }
-        message_bytes = json.dumps(data).encode()
-        length_bytes = len(message_bytes).to_bytes(4, 'big')
-        return length_bytes + message_bytes
+            "ts": message.timestamp,
+            "sid": message.sender_id
+        }, use_bin_type=True)
+        return _pack_len(len(message_bytes)) + message_bytes
     
     def deserialize_message(self, data: bytes) -> Message:
         """
@@ -92,18 +111,22 @@ class Protocol:
             Message: Deserialized message
         """
         try:
-            data_dict = json.loads(data.decode())
+            data_dict = msgpack.unpackb(data, raw=False)
+            msg_type = data_dict["type"]
+            # Opcodes index the handler table directly, so reject anything outside it
+            if type(msg_type) is not int or not 0 <= msg_type <= self.MSG_MAX:
+                raise ValueError(f"Unknown message type: {msg_type!r}")
             return Message(
-                type=data_dict["type"],
+                type=msg_type,
                 data=data_dict["data"],
-                timestamp=datetime.fromisoformat(data_dict["timestamp"]),
-                sender_id=data_dict["sender_id"]
+                timestamp=data_dict["ts"],
+                sender_id=data_dict["sid"]
             )
         except Exception as e:
-            logger.error(f"Error deserializing message: {str(e)}")
+            logger.error("Error deserializing message: %s", e)
             raise
     
-    def register_handler(self, msg_type: str, handler: callable):
+    def register_handler(self, msg_type: int, handler: Callable[[Message], Optional[Message]]):
         """
         Register a handler for a message type
         
@@ -111,7 +134,7 @@ class Protocol:
             msg_type: Type of message to handle
             handler: Function to call when message is received
         """
-        self.message_handlers[msg_type] = handler
+        self.handlers[msg_type] = handler
     
     def handle_message(self, message: Message) -> Optional[Message]:
         """
@@ -123,14 +146,15 @@ class Protocol:
         Returns:
             Optional[Message]: Response message if any
         """
-        logger.info(f"Handling message type: {message.type}")
-        if message.type in self.message_handlers:
-            response = self.message_handlers[message.type](message)
+        logger.info("Handling message type: %s", message.type)
+        handler = self.handlers[message.type]
+        if handler:
+            response = handler(message)
             if response:
-                logger.info(f"Created response message type: {response.type}")
+                logger.info("Created response message type: %s", response.type)
             return response
         else:
-            logger.warning(f"No handler for message type: {message.type}")
+            logger.warning("No handler for message type: %s", message.type)
             return None
     
     def create_hello_message(self) -> Message:
@@ -162,20 +186,35 @@ class Protocol:
         """Create a file response message"""
         return self.create_message(self.MSG_FILE_RESPONSE, {
             "file_id": file_id,
-            "data": data.hex()  # Convert bytes to hex string for JSON
+            "data": data  # Raw bytes, packed as msgpack bin
+        })
+    
+    def create_file_stream_message(self, file_id: str, size: int) -> Message:
+        """Create a file stream header announcing `size` raw bytes after the frame"""
+        return self.create_message(self.MSG_FILE_STREAM, {
+            "file_id": file_id,
+            "size": size
+        })
+    
+    def create_file_stream_error_message(self, file_id: str, error: str) -> Message:
+        """Create a file stream header with no body, telling the requester the file won't be sent"""
+        return self.create_message(self.MSG_FILE_STREAM, {
+            "file_id": file_id,
+            "size": 0,
+            "error": error
         })
     
     def create_ping_message(self) -> Message:
         """Create a ping message"""
         return self.create_message(self.MSG_PING, {
-            "timestamp": datetime.now().isoformat()
+            "timestamp": time.time()
         })
     
-    def create_pong_message(self, ping_timestamp: str) -> Message:
+    def create_pong_message(self, ping_timestamp: float) -> Message:
         """Create a pong message"""
         return self.create_message(self.MSG_PONG, {
             "ping_timestamp": ping_timestamp,
-            "pong_timestamp": datetime.now().isoformat()
+            "pong_timestamp": time.time()
         })
     
     def create_goodbye_message(self) -> Message:
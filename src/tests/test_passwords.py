@@ -0,0 +1,39 @@
+"""
+Test cases for password hashing
+"""
+
+import hashlib
+import unittest
+from src.ui.passwords import hash_password, verify_password
+
+class TestPasswords(unittest.TestCase):
+    def test_round_trip(self):
+        """Test that a hashed password verifies"""
+        stored = hash_password("correct horse")
+        self.assertTrue(verify_password("correct horse", stored))
+
+    def test_wrong_password(self):
+        """Test that a different password does not verify"""
+        stored = hash_password("correct horse")
+        self.assertFalse(verify_password("battery staple", stored))
+
+    def test_legacy_sha256_hash(self):
+        """Test that unsalted SHA-256 hashes from older accounts still verify"""
+        stored = hashlib.sha256(b"correct horse").hexdigest()
+        self.assertTrue(verify_password("correct horse", stored))
+        self.assertFalse(verify_password("battery staple", stored))
+
+    def test_malformed_hash(self):
+        """Test that a salt$digest string that is not hex is rejected"""
+        self.assertFalse(verify_password("correct horse", "not-hex$zz"))
+        self.assertFalse(verify_password("correct horse", "$"))
+
+    def test_salts_differ(self):
+        """Test that hashing the same password twice uses different salts"""
+        first = hash_password("correct horse")
+        second = hash_password("correct horse")
+        self.assertNotEqual(first.partition('$')[0], second.partition('$')[0])
+        self.assertNotEqual(first, second)
+
+if __name__ == '__main__':
+    unittest.main()
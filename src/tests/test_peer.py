@@ -3,88 +3,222 @@ Test cases for Peer implementation
 """
 
 import unittest
+import os
+import socket
+import tempfile
 import threading
 import time
-from src.network.peer import Peer
+import tracemalloc
+from src.network.peer import Peer, MAX_FILE_STREAM_SIZE
+from src.network.protocol import Protocol
+
+def _raw_connect(port: int) -> socket.socket:
+    """Open a plain socket to a peer and complete the hello handshake by hand"""
+    sock = socket.create_connection(("127.0.0.1", port), timeout=2)
+    sock.sendall(Protocol("raw_client").hello_frame)
+    return sock
+
+def _wait_closed(sock: socket.socket) -> bool:
+    """Drain a socket until the peer closes it; False if it stays open"""
+    try:
+        while sock.recv(65536):
+            pass
+    except ConnectionResetError:
+        pass
+    except socket.timeout:
+        return False
+    return True
 
 class TestPeer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """Start one pair of peers shared by all tests, on ports picked by the OS"""
+        cls.peer1 = Peer("127.0.0.1", 0)
+        cls.peer2 = Peer("127.0.0.1", 0)
+        cls.peer1.start()
+        cls.peer2.start()
+        cls.port1 = cls.peer1.port
+        cls.port2 = cls.peer2.port
+
+    @classmethod
+    def tearDownClass(cls):
+        """Stop the shared peers"""
+        cls.peer1.stop()
+        cls.peer2.stop()
+
     def setUp(self):
-        """Set up test cases"""
-        self.peer1 = Peer("127.0.0.1", 8000)
-        self.peer2 = Peer("127.0.0.1", 8001)
-    
-    def tearDown(self):
-        """Clean up after tests"""
-        if self.peer1.connected:
-            self.peer1.stop()
-        if self.peer2.connected:
-            self.peer2.stop()
-    
+        """Reset connections and peer tables left over from the previous test"""
+        self.peer1.reset()
+        self.peer2.reset()
+
     def test_peer_initialization(self):
         """Test peer initialization"""
-        self.assertIsNotNone(self.peer1.id)
-        self.assertEqual(self.peer1.host, "127.0.0.1")
-        self.assertEqual(self.peer1.port, 8000)
-        self.assertFalse(self.peer1.connected)
-    
+        peer = Peer("127.0.0.1", 8000)
+        self.assertIsNotNone(peer.id)
+        self.assertEqual(peer.host, "127.0.0.1")
+        self.assertEqual(peer.port, 8000)
+        self.assertFalse(peer.connected)
+
     def test_peer_start_stop(self):
         """Test starting and stopping a peer"""
+        peer = Peer("127.0.0.1", 0)
+
         # Test starting peer
-        self.peer1.start()
-        self.assertTrue(self.peer1.connected)
-        self.assertIsNotNone(self.peer1._socket)
-        self.assertIsNotNone(self.peer1._listener_thread)
-        
+        peer.start()
+        self.assertTrue(peer.connected)
+        self.assertNotEqual(peer.port, 0)
+        self.assertNotEqual(peer.id, self.peer1.id)
+        self.assertIsNotNone(peer._socket)
+        self.assertIsNotNone(peer._listener_thread)
+
         # Test stopping peer
-        self.peer1.stop()
-        self.assertFalse(self.peer1.connected)
-        self.assertIsNone(self.peer1._socket)
-        self.assertIsNone(self.peer1._listener_thread)
-    
+        peer.stop()
+        self.assertFalse(peer.connected)
+        self.assertIsNone(peer._socket)
+        self.assertIsNone(peer._listener_thread)
+
     def test_peer_connection(self):
         """Test connecting peers"""
-        # Start both peers
-        self.peer1.start()
-        self.peer2.start()
-        
         # Try to connect peer2 to peer1
-        result = self.peer2.connect("127.0.0.1", 8000)
+        result = self.peer2.connect("127.0.0.1", self.port1)
         self.assertTrue(result)
-        
+
         # Check if peer2 has peer1 in its peer list
         self.assertIn(self.peer1.id, self.peer2.peers)
-        
+
         # Check peer info
         peer_info = self.peer2.get_peer_info(self.peer1.id)
         self.assertIsNotNone(peer_info)
-        self.assertEqual(peer_info.address, ("127.0.0.1", 8000))
-    
+        self.assertEqual(peer_info.address, ("127.0.0.1", self.port1))
+
     def test_peer_disconnection(self):
         """Test disconnecting peers"""
-        # Start and connect peers
-        self.peer1.start()
-        self.peer2.start()
-        self.peer2.connect("127.0.0.1", 8000)
-        
+        self.peer2.connect("127.0.0.1", self.port1)
+
         # Test disconnection
         result = self.peer2.disconnect(self.peer1.id)
         self.assertTrue(result)
-        
+
         # Check peer status
         peer_info = self.peer2.get_peer_info(self.peer1.id)
         self.assertEqual(peer_info.status, 'offline')
-    
+
     def test_connected_peers(self):
         """Test getting connected peers"""
-        # Start and connect peers
-        self.peer1.start()
-        self.peer2.start()
-        self.peer2.connect("127.0.0.1", 8000)
-        
+        self.peer2.connect("127.0.0.1", self.port1)
+
         # Get connected peers
         connected_peers = self.peer2.get_connected_peers()
         self.assertEqual(len(connected_peers), 1)
         self.assertEqual(connected_peers[0].id, self.peer1.id)
 
+    def _share_random_file(self, peer: Peer, file_id: str, size: int) -> bytes:
+        """Share a temporary file of random bytes from a peer and return its contents"""
+        payload = os.urandom(size)
+        with tempfile.NamedTemporaryFile(delete=False) as f:
+            f.write(payload)
+        self.addCleanup(os.unlink, f.name)
+        peer.share_file(file_id, f.name)
+        return payload
+    
+    def _capture_stream(self, peer: Peer):
+        """Replace a peer's file stream handler for this test; returns (message data, event)"""
+        received = {}
+        done = threading.Event()
+        def on_stream(message):
+            received.update(message.data)
+            done.set()
+        handlers = peer.protocol.handlers
+        self.addCleanup(handlers.__setitem__, Protocol.MSG_FILE_STREAM, handlers[Protocol.MSG_FILE_STREAM])
+        peer.protocol.register_handler(Protocol.MSG_FILE_STREAM, on_stream)
+        return received, done
+    
+    def test_file_stream_round_trip(self):
+        """Test requesting a shared file and receiving its bytes"""
+        payload = self._share_random_file(self.peer1, "file1", 300 * 1024)
+        received, done = self._capture_stream(self.peer2)
+        
+        self.assertTrue(self.peer2.connect("127.0.0.1", self.port1))
+        self.assertTrue(self.peer2.request_file(self.peer1.id, "file1"))
+        self.assertTrue(done.wait(timeout=5))
+        self.assertEqual(received["file_id"], "file1")
+        self.assertEqual(received["data"], payload)
+    
+    def test_file_streams_in_both_directions(self):
+        """Test that two peers can send each other files over one connection at once"""
+        payload1 = self._share_random_file(self.peer1, "file1", 32 * 1024 * 1024)
+        payload2 = self._share_random_file(self.peer2, "file2", 32 * 1024 * 1024)
+        received1, done1 = self._capture_stream(self.peer1)
+        received2, done2 = self._capture_stream(self.peer2)
+        self.assertTrue(self.peer2.connect("127.0.0.1", self.port1))
+        
+        barrier = threading.Barrier(2)
+        def request(peer, peer_id, file_id):
+            barrier.wait()
+            peer.request_file(peer_id, file_id)
+        threads = [
+            threading.Thread(target=request, args=(self.peer1, self.peer2.id, "file2")),
+            threading.Thread(target=request, args=(self.peer2, self.peer1.id, "file1")),
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertTrue(done1.wait(timeout=10))
+        self.assertTrue(done2.wait(timeout=10))
+        self.assertEqual(received1["data"], payload2)
+        self.assertEqual(received2["data"], payload1)
+    
+    def test_unknown_file_request_answered(self):
+        """Test that requesting a file that isn't shared gets an error back"""
+        received, done = self._capture_stream(self.peer2)
+        
+        self.assertTrue(self.peer2.connect("127.0.0.1", self.port1))
+        self.assertTrue(self.peer2.request_file(self.peer1.id, "missing"))
+        self.assertTrue(done.wait(timeout=5))
+        self.assertEqual(received["file_id"], "missing")
+        self.assertEqual(received["error"], "not_found")
+        self.assertNotIn("data", received)
+    
+    def test_unrequested_file_stream_rejected(self):
+        """Test that a file stream nobody asked for closes the connection"""
+        header = Protocol("raw_client").create_file_stream_message("file1", 2 ** 30)
+        with _raw_connect(self.port1) as sock:
+            sock.sendall(Protocol("raw_client").serialize_message(header))
+            self.assertTrue(_wait_closed(sock))
+    
+    def test_malformed_frame_length_rejected(self):
+        """Test that a zero or oversized frame length closes the connection"""
+        for length in (0, 0xFFFFFFFF):
+            with self.subTest(length=length), _raw_connect(self.port1) as sock:
+                sock.sendall(length.to_bytes(4, 'big'))
+                self.assertTrue(_wait_closed(sock))
+    
+    def test_requested_file_stream_buffers_received_bytes_only(self):
+        """Test that a large announced stream doesn't allocate more than what has arrived"""
+        raw = Protocol("raw_server")
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            server.settimeout(2)
+            accepted = []
+            def serve():
+                conn, _ = server.accept()
+                conn.sendall(raw.hello_frame)
+                accepted.append(conn)
+            thread = threading.Thread(target=serve)
+            thread.start()
+            self.assertTrue(self.peer1.connect("127.0.0.1", server.getsockname()[1]))
+            thread.join()
+        
+        with accepted[0] as conn:
+            tracemalloc.start()
+            self.addCleanup(tracemalloc.stop)
+            self.assertTrue(self.peer1.request_file("raw_server", "big"))
+            header = raw.create_file_stream_message("big", MAX_FILE_STREAM_SIZE // 2)
+            conn.sendall(raw.serialize_message(header) + b"partial body")
+            time.sleep(0.2)
+            _, peak = tracemalloc.get_traced_memory()
+        self.assertLess(peak, 16 * 1024 * 1024)
+
 if __name__ == '__main__':
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
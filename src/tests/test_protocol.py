@@ -0,0 +1,50 @@
+"""
+Test cases for Protocol implementation
+"""
+
+import unittest
+from src.network.protocol import Protocol
+
+class TestProtocol(unittest.TestCase):
+    def setUp(self):
+        """Set up test cases"""
+        self.protocol = Protocol("test_peer")
+    
+    def test_message_round_trip(self):
+        """Test serializing and deserializing a message"""
+        message = self.protocol.create_hello_message()
+        frame = self.protocol.serialize_message(message)
+        
+        # Check length prefix
+        self.assertEqual(int.from_bytes(frame[:4], 'big'), len(frame) - 4)
+        
+        # Check decoded fields
+        decoded = self.protocol.deserialize_message(frame[4:])
+        self.assertEqual(decoded.type, Protocol.MSG_HELLO)
+        self.assertEqual(decoded.data, message.data)
+        self.assertEqual(decoded.sender_id, "test_peer")
+        self.assertEqual(decoded.timestamp, message.timestamp)
+    
+    def test_file_response_keeps_raw_bytes(self):
+        """Test that file data is carried as raw bytes"""
+        payload = bytes(range(256))
+        message = self.protocol.create_file_response_message("file1", payload)
+        frame = self.protocol.serialize_message(message)
+        
+        # Raw bytes must not be hex-expanded on the wire
+        self.assertLess(len(frame), 2 * len(payload))
+        
+        decoded = self.protocol.deserialize_message(frame[4:])
+        self.assertEqual(decoded.data["file_id"], "file1")
+        self.assertEqual(decoded.data["data"], payload)
+    
+    def test_unknown_message_type_rejected(self):
+        """Test that out-of-range opcodes are rejected on decode"""
+        for msg_type in (-1, Protocol.MSG_MAX + 1, "hello"):
+            message = self.protocol.create_message(msg_type, {})
+            frame = self.protocol.serialize_message(message)
+            with self.assertRaises(ValueError):
+                self.protocol.deserialize_message(frame[4:])
+
+if __name__ == '__main__':
+    unittest.main()
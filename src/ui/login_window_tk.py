@@ -0,0 +1,294 @@
+import logging
+import threading
+import tkinter as tk
+from tkinter import ttk, messagebox
+from datetime import datetime
+
+from src.database.dht_storage import DHTStorage
+from src.database.storage import LocalStorage
+from src.ui.passwords import hash_password, verify_password
+
+logger = logging.getLogger('ui')
+
+# One DHT node shared by every login window in the process, stopped when the
+# last window releases it
+_DHT_LOCK = threading.Lock()
+_DHT_INSTANCE = None
+_DHT_REFS = 0
+
+def _acquire_dht() -> DHTStorage:
+    """Return the shared DHT storage, starting it on first use"""
+    global _DHT_INSTANCE, _DHT_REFS
+    with _DHT_LOCK:
+        if _DHT_INSTANCE is None:
+            dht = DHTStorage()
+            dht.start()
+            _DHT_INSTANCE = dht
+        _DHT_REFS += 1
+        return _DHT_INSTANCE
+
+def _release_dht():
+    """Drop a reference to the shared DHT storage, stopping it with the last one"""
+    global _DHT_INSTANCE, _DHT_REFS
+    with _DHT_LOCK:
+        if _DHT_REFS == 0:
+            return
+        _DHT_REFS -= 1
+        if _DHT_REFS == 0:
+            _DHT_INSTANCE.stop()
+            _DHT_INSTANCE = None
+
+class LoginWindowTkDHT:
+    """Tk login window backed by DHT storage"""
+    
+    def __init__(self, root=None):
+        self.username = None
+        self.password = None
+        self.success = False
+        self.root = root or tk.Tk()
+        self.root.title("P2P File Sharing - Login")
+        self.root.geometry("350x250")
+        self.root.resizable(False, False)
+        
+        # DHT storage is started in the background once the window is drawn
+        self.dht = None
+        self._dht_ready = threading.Event()
+
+        frame = ttk.Frame(self.root, padding=20)
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        # Username
+        ttk.Label(frame, text="Username:").grid(row=0, column=0, sticky=tk.W, pady=(0, 10))
+        self.username_entry = ttk.Entry(frame, width=25)
+        self.username_entry.grid(row=0, column=1, pady=(0, 10))
+        self.username_entry.focus()
+
+        # Password
+        ttk.Label(frame, text="Password:").grid(row=1, column=0, sticky=tk.W)
+        self.password_entry = ttk.Entry(frame, width=25, show="*")
+        self.password_entry.grid(row=1, column=1)
+
+        # Buttons
+        button_frame = ttk.Frame(frame)
+        button_frame.grid(row=2, column=0, columnspan=2, pady=20)
+        
+        self.login_button = ttk.Button(button_frame, text="Login", command=self.try_login, state='disabled')
+        self.login_button.pack(side=tk.LEFT, padx=5)
+        
+        self.register_button = ttk.Button(button_frame, text="Register", command=self.try_register, state='disabled')
+        self.register_button.pack(side=tk.LEFT, padx=5)
+
+        self.root.bind('<Return>', lambda event: self.try_login())
+
+        # Paint the window first, then bring the DHT up while the user types
+        self.root.update_idletasks()
+        threading.Thread(target=self._init_dht, daemon=True).start()
+
+    def _init_dht(self):
+        """Start DHT storage off the Tk thread and enable the buttons once it is ready"""
+        try:
+            dht = _acquire_dht()
+        except Exception as e:
+            logger.error("Failed to initialize DHT storage: %s", e)
+            self.root.after(0, self._on_dht_failed)
+            return
+        self.dht = dht
+        self._dht_ready.set()
+        self.root.after(0, self._on_dht_ready)
+
+    def _on_dht_ready(self):
+        """Enable the buttons once storage is available"""
+        self.login_button.config(state='normal')
+        self.register_button.config(state='normal')
+
+    def _on_dht_failed(self):
+        """Report a storage failure and close the window"""
+        messagebox.showerror("Error", "Failed to initialize storage system. Please try again.")
+        self.root.quit()
+
+    def _verify_credentials(self, username: str, password: str) -> bool:
+        """Verify user credentials against DHT storage"""
+        try:
+            # Runs on the DHT's own long-lived event loop
+            user_data = self.dht.run_coroutine(self.dht.get_user_data(username))
+            if user_data and verify_password(password, user_data.get("password_hash", "")):
+                return True
+            return False
+        except Exception as e:
+            logger.error("Error verifying credentials: %s", e)
+            return False
+
+    def _register_user(self, username: str, password: str) -> bool:
+        """Register a new user in DHT storage"""
+        try:
+            # Create user data
+            user_data = {
+                "username": username,
+                "password_hash": hash_password(password),
+                "created_at": str(datetime.now()),
+                "files": []
+            }
+            
+            # Check and store in a single call on the DHT loop
+            success = self.dht.run_coroutine(self.dht.store_user_data_if_absent(username, user_data))
+            if success:
+                logger.info("Successfully registered user %s", username)
+            return success
+        except Exception as e:
+            logger.error("Error registering user: %s", e)
+            return False
+
+    def try_login(self):
+        """Handle login attempt"""
+        if not self._dht_ready.is_set():
+            return
+        
+        username = self.username_entry.get().strip()
+        password = self.password_entry.get().strip()
+        
+        if not username or not password:
+            messagebox.showwarning("Missing Information", "Please enter both username and password.")
+            return
+        
+        # Verify credentials
+        if self._verify_credentials(username, password):
+            self.username = username
+            self.password = password
+            self.success = True
+            self.root.quit()
+        else:
+            messagebox.showerror("Login Failed", "Invalid username or password.")
+
+    def try_register(self):
+        """Handle registration attempt"""
+        if not self._dht_ready.is_set():
+            return
+        
+        username = self.username_entry.get().strip()
+        password = self.password_entry.get().strip()
+        
+        if not username or not password:
+            messagebox.showwarning("Missing Information", "Please enter both username and password.")
+            return
+        
+        if len(password) < 6:
+            messagebox.showwarning("Weak Password", "Password must be at least 6 characters long.")
+            return
+        
+        # Try to register
+        if self._register_user(username, password):
+            messagebox.showinfo("Success", "Registration successful! Please login.")
+            self.password_entry.delete(0, tk.END)
+        else:
+            messagebox.showerror("Registration Failed", "Username already exists.")
+
+    def show(self):
+        """Show the login window and return username if successful"""
+        self.root.mainloop()
+        if self.success:
+            self.root.destroy()
+            return self.username
+        else:
+            self.root.destroy()
+            return None
+
+    def __del__(self):
+        """Cleanup when the window is destroyed"""
+        try:
+            if getattr(self, 'dht', None):
+                self.dht = None
+                _release_dht()
+        except:
+            pass 
+
+class LoginWindowTkLocal:
+    """Tk login window backed by local storage"""
+    
+    def __init__(self, root, on_login_success):
+        self.root = root
+        self.root.title("P2P File Sharing - Login")
+        self.root.geometry("400x300")
+        self.on_login_success = on_login_success
+        
+        # Initialize storage
+        self.storage = LocalStorage()
+        self.storage.start()
+        
+        # Create main frame
+        self.main_frame = ttk.Frame(self.root, padding="20")
+        self.main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Username
+        ttk.Label(self.main_frame, text="Username:").grid(row=0, column=0, sticky=tk.W, pady=5)
+        self.username_var = tk.StringVar()
+        self.username_entry = ttk.Entry(self.main_frame, textvariable=self.username_var)
+        self.username_entry.grid(row=0, column=1, sticky=(tk.W, tk.E), pady=5)
+        
+        # Password
+        ttk.Label(self.main_frame, text="Password:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        self.password_var = tk.StringVar()
+        self.password_entry = ttk.Entry(self.main_frame, textvariable=self.password_var, show="*")
+        self.password_entry.grid(row=1, column=1, sticky=(tk.W, tk.E), pady=5)
+        
+        # Buttons
+        self.button_frame = ttk.Frame(self.main_frame)
+        self.button_frame.grid(row=2, column=0, columnspan=2, pady=20)
+        
+        ttk.Button(self.button_frame, text="Login", command=self.login).pack(side=tk.LEFT, padx=5)
+        ttk.Button(self.button_frame, text="Register", command=self.register).pack(side=tk.LEFT, padx=5)
+        
+        # Bind Enter key to login
+        self.root.bind('<Return>', lambda e: self.login())
+        
+        # Center the window
+        self.root.update_idletasks()
+        width = self.root.winfo_width()
+        height = self.root.winfo_height()
+        x = (self.root.winfo_screenwidth() // 2) - (width // 2)
+        y = (self.root.winfo_screenheight() // 2) - (height // 2)
+        self.root.geometry(f'{width}x{height}+{x}+{y}')
+    
+    def login(self):
+        username = self.username_var.get().strip()
+        password = self.password_var.get()
+        
+        if not username or not password:
+            messagebox.showerror("Error", "Please enter both username and password")
+            return
+        
+        try:
+            if self.storage.verify_user(username, password):
+                logger.info("User %s logged in successfully", username)
+                self.storage.stop()
+                self.on_login_success(username)
+            else:
+                messagebox.showerror("Error", "Invalid username or password")
+        except Exception as e:
+            logger.error("Login error: %s", e)
+            messagebox.showerror("Error", "An error occurred during login")
+    
+    def register(self):
+        username = self.username_var.get().strip()
+        password = self.password_var.get()
+        
+        if not username or not password:
+            messagebox.showerror("Error", "Please enter both username and password")
+            return
+        
+        if len(password) < 6:
+            messagebox.showerror("Error", "Password must be at least 6 characters long")
+            return
+        
+        try:
+            if self.storage.store_user(username, password):
+                messagebox.showinfo("Success", "Registration successful! You can now login.")
+                self.password_var.set("")  # Clear password field
+            else:
+                messagebox.showerror("Error", "Username already exists")
+        except Exception as e:
+            logger.error("Registration error: %s", e)
+            messagebox.showerror("Error", "An error occurred during registration")
+    
+    def cleanup(self):
+        """Cleanup resources"""
+        self.storage.stop() 
\ No newline at end of file
@@ -7,6 +7,8 @@ import os
 
 logger = logging.getLogger(__name__)
 
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
 class MainWindow:
     def __init__(self, root, username, storage):
         self.root = root
@@ -15,6 +17,8 @@ class MainWindow:
         
         # Initialize tree views
         self.file_tree = None
+        # Metadata from the last refresh, keyed by file hash (also the tree item id)
+        self.files_data = {}
         
         self.root.title(f"P2P File Sharing - {username}")
         self.root.geometry("800x600")
@@ -97,11 +101,11 @@ class MainWindow:
     
     def format_size(self, size_bytes: int) -> str:
         """Format file size in human readable format"""
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if size_bytes < 1024:
-                return f"{size_bytes:.1f} {unit}"
-            size_bytes /= 1024
-        return f"{size_bytes:.1f} TB"
+        if size_bytes < 1024:
+            return f"{size_bytes:.1f} B"
+        # Each unit is 2**10 of the previous, so the bit length picks it directly
+        idx = min((int(size_bytes).bit_length() - 1) // 10, 4)
+        return f"{size_bytes / (1 << (idx * 10)):.1f} {_SIZE_UNITS[idx]}"
     
     def upload_file(self):
         """Handle file upload"""
@@ -148,30 +152,42 @@ class MainWindow:
     
     def refresh_files(self):
         """Refresh the file list"""
-        # Clear current items
-        for item in self.file_tree.get_children():
-            self.file_tree.delete(item)
-        
         try:
-            # Get all files from storage
+            # Get all files from storage and build every row before touching the widget
             files_data = self.storage.get_all_files()
-            
-            # Add files to treeview
-            for file_hash, file_data in files_data.items():
-                # Add a visual indicator for files owned by the current user
-                filename = file_data["filename"]
-                if file_data.get("owner") == self.username:
-                    filename = f"📁 {filename}"  # Add folder emoji for owned files
-                
-                self.file_tree.insert("", tk.END, values=(
-                    filename,
-                    self.format_size(file_data["size"]),
+            username = self.username
+            format_size = self.format_size
+            rows = [
+                (file_hash, (
+                    # Add a visual indicator for files owned by the current user
+                    f"📁 {file_data['filename']}" if file_data.get("owner") == username
+                    else file_data["filename"],
+                    format_size(file_data["size"]),
                     file_data["type"],
                     len(file_data.get("peers", []))
                 ))
+                for file_hash, file_data in files_data.items()
+            ]
         except Exception as e:
             logger.error(f"Error refreshing files: {str(e)}")
             messagebox.showerror("Error", "Failed to refresh file list")
+            return
+        
+        self.files_data = files_data
+        
+        # Clear current items in a single call
+        self.file_tree.delete(*self.file_tree.get_children())
+        
+        # Take the tree off screen while filling it so it is laid out and drawn once
+        self.file_tree.grid_remove()
+        try:
+            # Add files to treeview, using the file hash as the item id
+            insert = self.file_tree.insert
+            for file_hash, values in rows:
+                insert("", tk.END, iid=file_hash, values=values)
+        finally:
+            # grid_remove() kept the tree's grid options, so grid() restores it in place
+            self.file_tree.grid()
     
     def on_file_double_click(self, _event):
         """Handle double-click on a file"""
@@ -202,26 +218,15 @@ class MainWindow:
             messagebox.showwarning("Warning", "Please select a file to delete")
             return
         
-        # Get the selected item's values
-        item = selected[0]
-        filename = self.file_tree.item(item)["values"][0]
+        # The selected item id is the file hash
+        file_hash = selected[0]
         
         try:
-            # Get all files to find the file hash
-            files_data = self.storage.get_all_files()
-            file_hash = None
-            file_data = None
-            
-            # Find the file hash for the selected file
-            for hash_value, data in files_data.items():
-                if data["filename"] == filename:
-                    file_hash = hash_value
-                    file_data = data
-                    break
-            
-            if not file_hash or not file_data:
-                messagebox.showerror("Error", f"Could not find file {filename}")
+            file_data = self.files_data.get(file_hash)
+            if not file_data:
+                messagebox.showerror("Error", "Could not find the selected file")
                 return
+            filename = file_data["filename"]
             
             # Check if the user is the owner
             if file_data.get("owner") != self.username:
@@ -0,0 +1,38 @@
+"""
+Password hashing shared by the login windows
+"""
+
+import hashlib
+import hmac
+import os
+from functools import partial
+
+# scrypt cost parameters: 16 MiB of memory per derivation
+_SCRYPT_N = 2 ** 14
+_SCRYPT_R = 8
+_SCRYPT_P = 1
+_SALT_SIZE = 16
+
+# Bound once at import: scrypt with the cost parameters applied, and the
+# other callables used on every login
+_scrypt = partial(hashlib.scrypt, n=_SCRYPT_N, r=_SCRYPT_R, p=_SCRYPT_P, dklen=32)
+_sha256 = hashlib.sha256
+_compare_digest = hmac.compare_digest
+
+def hash_password(password: str) -> str:
+    """Hash a password with a fresh salt, stored as 'salt$digest' in hex"""
+    salt = os.urandom(_SALT_SIZE)
+    return f"{salt.hex()}${_scrypt(password.encode(), salt=salt).hex()}"
+
+def verify_password(password: str, stored_hash: str) -> bool:
+    """Check a password against a stored hash in constant time"""
+    pw_bytes = password.encode()
+    salt_hex, sep, digest_hex = stored_hash.partition('$')
+    if not sep:
+        # Unsalted SHA-256 hex digest from accounts created before scrypt
+        return _compare_digest(_sha256(pw_bytes).hexdigest(), stored_hash)
+    try:
+        salt, digest = bytes.fromhex(salt_hex), bytes.fromhex(digest_hex)
+    except ValueError:
+        return False
+    return _compare_digest(_scrypt(pw_bytes, salt=salt), digest)
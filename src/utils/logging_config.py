@@ -1,5 +1,27 @@
+import atexit
 import logging
+import queue
 import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+class CachedTimeFormatter(logging.Formatter):
+    """Formatter that formats each whole second's timestamp only once"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_time = (None, '')  # (second, formatted), replaced as one tuple
+    
+    def formatTime(self, record, datefmt=None):
+        # Without a datefmt the default format includes milliseconds, so it cannot be cached
+        if datefmt is None:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, formatted = self._cached_time
+        if second != cached_second:
+            formatted = time.strftime(datefmt, self.converter(second))
+            self._cached_time = (second, formatted)
+        return formatted
 
 def setup_logging():
     """Set up logging configuration"""
@@ -12,13 +34,21 @@ def setup_logging():
     console_handler.setLevel(logging.DEBUG)  # Set to DEBUG level
     
     # Create formatter with more detailed format
-    formatter = logging.Formatter(
+    formatter = CachedTimeFormatter(
         '%(asctime)s - %(levelname)s - [%(name)s] - %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
     console_handler.setFormatter(formatter)
     
+    # QueueHandler.prepare() still formats each record on the calling thread
+    # (message interpolation and traceback text); the listener thread runs the
+    # console handler's formatting and the stream write
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # Flush queued records on exit
+    
     # Add handler to logger
-    logger.addHandler(console_handler)
+    logger.addHandler(QueueHandler(log_queue))
     
     return logger 
\ No newline at end of file